@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+짧은 클립 배치 변환 처리량 측정
+개별 model.transcribe 호출과 TranscriptionBatcher의 초당 처리 작업 수를 비교
+
+사용법:
+  python benchmark_batch.py                 # base 모델 가중치 사용
+  python benchmark_batch.py --random-weights  # 가중치를 받을 수 없는 환경 (연산량만 비교)
+"""
+
+import argparse
+import threading
+import time
+import numpy as np
+import whisper
+import server
+
+# base 모델과 같은 구조 (무작위 가중치 측정용)
+BASE_DIMS = dict(
+    n_mels=80, n_audio_ctx=1500, n_audio_state=512, n_audio_head=8, n_audio_layer=6,
+    n_vocab=51865, n_text_ctx=448, n_text_state=512, n_text_head=8, n_text_layer=6
+)
+
+def make_clips(count, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(rng.standard_normal(seconds * whisper.audio.SAMPLE_RATE) * 0.1).astype(np.float32)
+            for _ in range(count)]
+
+def run_sequential(clips, quality_checks):
+    options = {} if quality_checks else dict(
+        temperature=0.0,
+        compression_ratio_threshold=None,
+        logprob_threshold=None,
+        no_speech_threshold=None
+    )
+    started = time.time()
+    for audio in clips:
+        server.model.transcribe(audio, language='ko', condition_on_previous_text=False, **options)
+    return len(clips) / (time.time() - started)
+
+def run_batched(clips):
+    batcher = server.TranscriptionBatcher()
+    threads = [threading.Thread(target=batcher.transcribe, args=(audio,)) for audio in clips]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(clips) / (time.time() - started)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--random-weights', action='store_true')
+    parser.add_argument('--clips', type=int, default=8)
+    parser.add_argument('--seconds', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.random_weights:
+        # 무작위 가중치에서는 품질 기준이 항상 실패하므로 양쪽 모두 끄고 연산량만 비교
+        server.model = whisper.model.Whisper(whisper.model.ModelDimensions(**BASE_DIMS)).eval()
+        server.COMPRESSION_RATIO_THRESHOLD = float('inf')
+        server.LOGPROB_THRESHOLD = float('-inf')
+        server.NO_SPEECH_THRESHOLD = float('inf')
+    else:
+        server.model = whisper.load_model(args.model)
+
+    clips = make_clips(args.clips, args.seconds)
+    run_batched(clips[:1])  # 워밍업
+
+    sequential = run_sequential(clips, quality_checks=not args.random_weights)
+    batched = run_batched(clips)
+    print(f"개별 변환: {sequential:.3f} jobs/sec")
+    print(f"배치 변환: {batched:.3f} jobs/sec ({batched / sequential:.2f}배)")
+
+if __name__ == '__main__':
+    main()
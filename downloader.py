@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+병렬 Range 다운로더와 프로세스 전체 연결/대역폭 조정기
+표준 라이브러리만 사용 (server.py와 test_downloader.py에서 사용)
+"""
+
+import os
+import json
+import queue
+import socket
+import threading
+import time
+import http.client
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 ** 2  # Range 요청 하나의 크기 (작을수록 재배분이 빠름)
+READ_SIZE = 64 * 1024  # 한 번에 읽는 바이트 수 (속도 조절 단위)
+TRANSIENT_HTTP_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 다시 시도하면 성공할 수 있는 오류인지 판단 (네트워크 오류, 429, 5xx)
+# yt-dlp의 DownloadError/ExtractorError는 원인 예외를 따라가며 확인
+def is_transient_error(error):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = getattr(error, 'status', None) or getattr(error, 'code', None)
+        if isinstance(status, int) and 400 <= status < 600:
+            return status in TRANSIENT_HTTP_STATUS or status >= 500
+        if isinstance(error, (ConnectionError, TimeoutError, socket.timeout,
+                              http.client.IncompleteRead, urllib.error.URLError)):
+            return True
+        if {cls.__name__ for cls in type(error).__mro__} & {'TransportError', 'IncompleteRead'}:
+            return True
+        exc_info = getattr(error, 'exc_info', None)
+        error = (getattr(error, 'cause', None) or error.__cause__
+                 or (exc_info[1] if exc_info else None))
+    return False
+
+# 다운로드 연결/대역폭 조정기
+# 동시에 실행 중인 작업들이 전체 연결 수와 초당 바이트를 공평하게 나눠 씀
+# 작업이 추가되거나 끝날 때마다 몫을 다시 계산하므로, 연결은 청크 단위로 재배분됨
+class DownloadGovernor:
+    def __init__(self, max_connections=16, max_bytes_per_second=0, max_connections_per_job=8):
+        self.max_connections = max_connections
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_connections_per_job = max_connections_per_job
+        self.jobs = {}  # job_id -> 사용 중인 연결 수 및 대역폭 토큰 상태 (등록 순서 유지)
+        self.condition = threading.Condition()
+
+    # 작업 등록 (작업마다 최소 한 개의 연결이 필요하므로 자리가 없으면 대기)
+    def register(self, job_id):
+        with self.condition:
+            while len(self.jobs) >= self.max_connections:
+                self.condition.wait()
+            self.jobs[job_id] = {'active': 0, 'tokens': 0.0, 'refilled_at': time.time()}
+            self.condition.notify_all()
+
+    def unregister(self, job_id):
+        with self.condition:
+            self.jobs.pop(job_id, None)
+            self.condition.notify_all()
+
+    # 작업이 현재 쓸 수 있는 연결 수 (나머지는 먼저 등록된 작업부터 하나씩)
+    def share(self, job_id):
+        with self.condition:
+            return self._share(job_id)
+
+    def _share(self, job_id):
+        if job_id not in self.jobs:
+            return 1
+        base, extra = divmod(self.max_connections, len(self.jobs))
+        rank = list(self.jobs).index(job_id)
+        return max(1, min(self.max_connections_per_job, base + (1 if rank < extra else 0)))
+
+    def _in_use(self):
+        return sum(job['active'] for job in self.jobs.values())
+
+    # 연결 슬롯을 빌림 (작업 몫과 전체 상한을 모두 넘지 않을 때까지 대기)
+    # count를 주면 여러 슬롯을 한꺼번에 빌리며, 실제로 빌린 수를 돌려줌
+    @contextmanager
+    def connection(self, job_id, count=1):
+        with self.condition:
+            while True:
+                job = self.jobs[job_id]
+                granted = min(count, self._share(job_id))
+                if (job['active'] + granted <= self._share(job_id)
+                        and self._in_use() + granted <= self.max_connections):
+                    break
+                self.condition.wait()
+            job['active'] += granted
+        try:
+            yield granted
+        finally:
+            with self.condition:
+                if job_id in self.jobs:
+                    self.jobs[job_id]['active'] -= granted
+                self.condition.notify_all()
+
+    # 받은 바이트만큼 토큰을 소비하고, 작업 몫(전체 속도 / 작업 수)을 넘으면 그만큼 대기
+    def throttle(self, job_id, nbytes):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or not self.max_bytes_per_second:
+                return
+            share = self.max_bytes_per_second / len(self.jobs)
+            now = time.time()
+            job['tokens'] = min(share, job['tokens'] + share * (now - job['refilled_at']))
+            job['refilled_at'] = now
+            job['tokens'] -= nbytes
+            delay = -job['tokens'] / share if job['tokens'] < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+
+class RangeNotSupported(Exception):
+    pass
+
+# 병렬 Range 다운로드
+# 파일을 chunk_size 단위로 나눠 조정기가 허락하는 연결 수만큼 동시에 받음
+# 진행 상황은 .part.json에 기록하므로 일시적 오류나 재실행 시 받은 부분부터 이어받음
+def download_ranges(url, path, job_id, governor, headers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    attempts=3, retry_delay=1.0, timeout=30):
+    if os.path.exists(path):
+        return path
+
+    headers = dict(headers or {})
+    part_path = path + '.part'
+    state_path = part_path + '.json'
+
+    try:
+        size = _with_retry(lambda: _probe_size(url, headers, timeout), attempts, retry_delay)
+    except RangeNotSupported:
+        # Range를 지원하지 않는 서버는 연결 하나로 처음부터 받음
+        def fetch_whole():
+            with governor.connection(job_id):
+                _fetch(url, headers, part_path, 0, None, job_id, governor, timeout, lambda n: None)
+        _with_retry(fetch_whole, attempts, retry_delay)
+        os.replace(part_path, path)
+        return path
+
+    chunks = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+    done = _load_state(state_path, size, len(chunks)) if os.path.exists(part_path) else None
+    if done is None:
+        done = [0] * len(chunks)
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+
+    state_lock = threading.Lock()
+    errors = []
+    pending = queue.Queue()
+    for index, (start, end) in enumerate(chunks):
+        if done[index] < end - start + 1:
+            pending.put(index)
+
+    def save_state():
+        with state_lock:
+            with open(state_path, 'w') as f:
+                json.dump({'size': size, 'done': done}, f)
+
+    def worker():
+        while not errors:
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            start, end = chunks[index]
+
+            def advance(nbytes):
+                with state_lock:
+                    done[index] += nbytes
+
+            for attempt in range(attempts):
+                try:
+                    with governor.connection(job_id):
+                        _fetch(url, headers, part_path, start + done[index], end,
+                               job_id, governor, timeout, advance)
+                    break
+                except Exception as e:
+                    save_state()
+                    if errors or attempt == attempts - 1 or not is_transient_error(e):
+                        errors.append(e)
+                        return
+                    time.sleep(retry_delay * 2 ** attempt)
+            save_state()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(governor.max_connections_per_job, len(chunks)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    os.replace(part_path, path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return path
+
+def _with_retry(func, attempts, retry_delay):
+    for attempt in range(attempts):
+        try:
+            return func()
+        except RangeNotSupported:
+            raise
+        except Exception as e:
+            if attempt == attempts - 1 or not is_transient_error(e):
+                raise
+            time.sleep(retry_delay * 2 ** attempt)
+
+def _probe_size(url, headers, timeout):
+    request = urllib.request.Request(url, headers=dict(headers, Range='bytes=0-0'))
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        content_range = response.headers.get('Content-Range', '')
+        if response.status != 206 or '/' not in content_range or content_range.endswith('/*'):
+            raise RangeNotSupported(url)
+        return int(content_range.rsplit('/', 1)[1])
+
+def _load_state(state_path, size, chunk_count):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('size') != size or len(state.get('done', [])) != chunk_count:
+        return None
+    return state['done']
+
+# start~end 범위를 받아 .part 파일의 같은 위치에 씀 (end가 None이면 전체)
+def _fetch(url, headers, part_path, start, end, job_id, governor, timeout, advance):
+    if end is not None:
+        if start > end:
+            return
+        headers = dict(headers, Range=f'bytes={start}-{end}')
+    request = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if end is not None and response.status != 206:
+            raise RangeNotSupported(url)
+        remaining = None if end is None else end - start + 1
+        with open(part_path, 'r+b' if end is not None else 'wb') as f:
+            f.seek(start)
+            while remaining is None or remaining > 0:
+                data = response.read(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                advance(len(data))
+                if remaining is not None:
+                    remaining -= len(data)
+                governor.throttle(job_id, len(data))
+        if remaining:
+            raise http.client.IncompleteRead(b'', remaining)
@@ -17,6 +17,15 @@ import whisper
 import zipfile
 import tempfile
 import shutil
+import queue
+import json
+import copy
+import sqlite3
+from collections import Counter
+import subprocess
+import numpy as np
+import torch
+from downloader import DownloadGovernor, download_ranges, is_transient_error
 
 app = Flask(__name__)
 CORS(app)
@@ -26,6 +35,52 @@ tasks = {}  # 작업 상태 저장
 model = None  # Whisper 모델
 temp_dir = tempfile.mkdtemp()  # 임시 디렉토리
 
+# 배치 변환 설정
+BATCH_WINDOW_MS = 200  # 배치를 모으는 최대 대기 시간 (추가 지연 상한)
+BATCH_MAX_ITEMS = 8  # 한 라운드에 디코딩할 최대 창 수
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)  # 품질 기준 미달 시 창별 온도 폴백 (model.transcribe 기본값과 동일)
+COMPRESSION_RATIO_THRESHOLD = 2.4  # 배치 결과 품질 기준 (model.transcribe 기본값과 동일)
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# 작업 비용 추정 및 스케줄링 설정
+MAX_JOB_DURATION_SECONDS = 4 * 3600  # 이보다 긴 영상은 거부
+MAX_JOB_FILESIZE_BYTES = 4 * 1024 ** 3  # 이보다 큰 파일은 거부
+TRANSCRIBE_SECONDS_PER_AUDIO_SECOND = 0.5  # 음성 1초당 예상 변환 시간
+DOWNLOAD_BYTES_PER_SECOND = 5 * 1024 ** 2  # 예상 다운로드 속도
+LONG_JOB_COST_SECONDS = 1800  # 이보다 비싼 작업은 긴 작업으로 분류 (동시 실행 제한)
+# 다운로드는 DownloadGovernor가, 모델 추론은 배치 변환기 스레드가 따로 제한하므로
+# 작업 수 상한은 배치 변환기가 BATCH_MAX_ITEMS를 채울 수 있을 만큼 넉넉하게 둠
+MAX_CONCURRENT_JOBS = 2 * BATCH_MAX_ITEMS  # 동시에 처리할 최대 작업 수
+MAX_CONCURRENT_LONG_JOBS = 1  # 동시에 처리할 최대 긴 작업 수
+AGING_SECONDS_PER_SECOND = 2.0  # 대기 1초당 줄어드는 우선순위 비용 (기아 방지)
+VIDEO_FORMAT = 'best[ext=mp4]/best'  # 비용 추정과 다운로드에 같은 포맷 사용
+AUDIO_FORMAT = 'bestaudio/best'
+
+# 다운로드 연결/대역폭 설정 (프로세스 전체 기준)
+MAX_DOWNLOAD_CONNECTIONS = 16  # 모든 작업이 함께 쓰는 최대 동시 연결 수
+MAX_CONNECTIONS_PER_JOB = 8  # 작업 하나가 쓸 수 있는 최대 연결 수
+MAX_DOWNLOAD_BYTES_PER_SECOND = 0  # 전체 다운로드 속도 상한 (0이면 제한 없음)
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 ** 2  # 병렬 Range 요청 하나의 크기
+DOWNLOAD_ATTEMPTS = 3  # 일시적 오류 시 이어받기 시도 횟수
+
+# 오디오 지문 기반 중복 변환 방지 설정
+DATA_DIR = os.environ.get('YOUTUBE_DECODING_DATA_DIR',
+                          os.path.join(os.path.expanduser('~'), '.youtube_decoding'))  # 영구 데이터 저장 위치
+FINGERPRINT_DB_PATH = os.path.join(DATA_DIR, 'fingerprints.db')
+FINGERPRINT_FRAME_SAMPLES = 6000  # 지문 프레임 길이 (16kHz 기준 0.375초)
+# 조회는 촘촘한 간격(12.5ms)으로 모든 프레임을 계산하고, 색인에는 0.4초마다 하나만 저장
+# 복사본이 임의의 샘플만큼 밀려 있어도 저장 프레임마다 100샘플 이내로 맞는 조회 프레임이 있음
+FINGERPRINT_HOP_SAMPLES = 200  # 프레임 간격
+FINGERPRINT_STORE_EVERY = 32  # 색인 저장 간격 (프레임 수)
+FINGERPRINT_SCHEMA_VERSION = 2  # 프레임 단위가 바뀌면 올림 (이전 색인은 다시 만듦)
+FINGERPRINT_WINDOW_SECONDS = 10  # 일치 여부를 판단하는 구간 길이
+FINGERPRINT_MIN_VOTES = 3  # 구간이 일치로 판정되는 최소 오프셋 투표 수
+FINGERPRINT_MAX_POSTINGS = 50  # 이보다 흔한 해시는 무시 (무음/잡음 등)
+DEDUP_MIN_MATCH_RATIO = 0.5  # 이 비율 이상의 구간이 일치하면 기존 자막 재사용
+DEDUP_BOUNDARY_TOLERANCE_SECONDS = 0.5  # 재사용 자막이 일치 구간 밖으로 벗어나도 되는 여유
+DEDUP_MIN_GAP_SECONDS = 1.0  # 이보다 짧은 미일치 부분은 다시 변환하지 않음
+
 # Whisper 모델 로드 (앱 시작 시)
 def load_whisper_model():
     global model
@@ -49,6 +104,127 @@ class ConversionTask:
         self.error = None
         self.files = []
         self.created_at = datetime.now()
+        self.estimate = None
+        self.queued_at = time.time()
+
+# 포맷 지정자로 실제 다운로드될 포맷 선택 (없으면 None)
+# yt-dlp의 포맷 선택을 다운로드 없이 그대로 거침 (병합 포맷은 requested_formats에 담김)
+def select_format(info, format_spec):
+    opts = {'format': format_spec, 'quiet': True, 'no_warnings': True}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        try:
+            return ydl.process_ie_result(copy.deepcopy(info), download=False)
+        except (yt_dlp.utils.ExtractorError, yt_dlp.utils.DownloadError):
+            return None
+
+# 선택된 포맷들의 파일 크기 합계 (알 수 없으면 None)
+# filesize_approx는 yt-dlp가 비트레이트와 길이로 채워 줌
+def selected_filesize(info, format_spec):
+    selected = select_format(info, format_spec)
+    if not selected:
+        return None
+    
+    total = 0
+    for fmt in selected.get('requested_formats') or [selected]:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size:
+            return None
+        total += size
+    return int(total)
+
+# 다운로드 없이 메타데이터만 조회하여 작업 비용 추정
+# 실제 다운로드와 같은 포맷 기준으로 계산하고, 알 수 없는 값은 상한으로 간주
+def probe_video(url):
+    probe_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'skip_download': True,
+    }
+    
+    with yt_dlp.YoutubeDL(probe_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    video_size = selected_filesize(info, VIDEO_FORMAT)
+    audio_size = selected_filesize(info, AUDIO_FORMAT)
+    
+    duration = info.get('duration')
+    filesize = video_size + audio_size if video_size and audio_size else None
+    
+    cost = ((duration or MAX_JOB_DURATION_SECONDS) * TRANSCRIBE_SECONDS_PER_AUDIO_SECOND
+            + (filesize or MAX_JOB_FILESIZE_BYTES) / DOWNLOAD_BYTES_PER_SECOND)
+    return {
+        'title': info.get('title', 'unknown'),
+        'duration': duration,
+        'filesize': filesize,
+        'cost': round(cost, 1),
+        'long': cost > LONG_JOB_COST_SECONDS or duration is None or filesize is None,
+        'live': bool(info.get('is_live')) or info.get('live_status') in ('is_live', 'is_upcoming')
+    }
+
+# 예상 비용 기반 작업 스케줄러 (짧은 작업 우선 + 대기 시간에 따른 노화)
+class JobScheduler:
+    def __init__(self, max_jobs=MAX_CONCURRENT_JOBS, max_long_jobs=MAX_CONCURRENT_LONG_JOBS):
+        self.max_jobs = max_jobs
+        self.max_long_jobs = max_long_jobs
+        self.pending = []
+        self.running_long = 0
+        self.condition = threading.Condition()
+        self.workers = []
+
+    def start(self):
+        with self.condition:
+            while len(self.workers) < self.max_jobs:
+                worker = threading.Thread(target=self._run)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def submit(self, task):
+        self.start()
+        with self.condition:
+            task.queued_at = time.time()
+            self.pending.append(task)
+            self.condition.notify()
+
+    # 대기 시간이 길수록 우선순위 비용이 줄어듦
+    def _priority(self, task, now):
+        return task.estimate['cost'] - AGING_SECONDS_PER_SECOND * (now - task.queued_at)
+
+    # 대기열에서의 현재 순번 (대기 중이 아니면 0)
+    def position(self, task):
+        with self.condition:
+            now = time.time()
+            ordered = sorted(self.pending, key=lambda t: self._priority(t, now))
+            return ordered.index(task) + 1 if task in ordered else 0
+
+    def _next_task(self):
+        now = time.time()
+        candidates = [t for t in self.pending
+                      if not t.estimate['long'] or self.running_long < self.max_long_jobs]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda t: self._priority(t, now))
+
+    def _run(self):
+        while True:
+            with self.condition:
+                task = self._next_task()
+                while task is None:
+                    self.condition.wait()
+                    task = self._next_task()
+                self.pending.remove(task)
+                if task.estimate['long']:
+                    self.running_long += 1
+
+            try:
+                process_video(task)
+            finally:
+                with self.condition:
+                    if task.estimate['long']:
+                        self.running_long -= 1
+                    self.condition.notify_all()
+
+scheduler = JobScheduler()
 
 # 메인 페이지
 @app.route('/')
@@ -100,6 +276,7 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'whisper_model': 'loaded' if model else 'not_loaded',
         'active_tasks': len([t for t in tasks.values() if not t.completed]),
+        'queued_tasks': len(scheduler.pending),
         'total_tasks': len(tasks)
     })
 
@@ -128,17 +305,42 @@ def convert_video():
         if not url:
             return jsonify({'success': False, 'error': 'URL이 필요합니다.'}), 400
         
+        # 메타데이터만 조회하여 비용 추정
+        try:
+            estimate = probe_video(url)
+        except Exception as e:
+            return jsonify({'success': False, 'error': f'영상 정보를 가져올 수 없습니다: {e}'}), 400
+        
+        if estimate['live']:
+            return jsonify({
+                'success': False,
+                'error': '실시간 방송이나 예정된 방송은 변환할 수 없습니다.',
+                'estimate': estimate
+            }), 400
+        
+        if ((estimate['duration'] or 0) > MAX_JOB_DURATION_SECONDS
+                or (estimate['filesize'] or 0) > MAX_JOB_FILESIZE_BYTES):
+            return jsonify({
+                'success': False,
+                'error': '영상이 너무 길거나 파일이 너무 큽니다.',
+                'estimate': estimate
+            }), 413
+        
         # 작업 ID 생성
         task_id = str(uuid.uuid4())
         task = ConversionTask(task_id, url)
+        task.estimate = estimate
+        task.status = "대기 중..."
         tasks[task_id] = task
         
-        # 백그라운드에서 변환 시작
-        thread = threading.Thread(target=process_video, args=(task,))
-        thread.daemon = True
-        thread.start()
+        # 예상 비용 순으로 스케줄링
+        scheduler.submit(task)
         
-        return jsonify({'success': True, 'taskId': task_id})
+        return jsonify({
+            'success': True,
+            'taskId': task_id,
+            'estimate': dict(estimate, queuePosition=scheduler.position(task))
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -156,7 +358,9 @@ def get_progress(task_id):
         'completed': task.completed,
         'success': task.success,
         'error': task.error,
-        'files': task.files
+        'files': task.files,
+        'estimate': task.estimate,
+        'queuePosition': scheduler.position(task)
     })
 
 # 파일 다운로드
@@ -224,62 +428,562 @@ def process_video(task):
         task.success = False
         task.status = f"오류: {str(e)}"
 
+# 프로세스 전체 다운로드 연결/대역폭 조정기 (downloader.py)
+governor = DownloadGovernor(
+    max_connections=MAX_DOWNLOAD_CONNECTIONS,
+    max_bytes_per_second=MAX_DOWNLOAD_BYTES_PER_SECOND,
+    max_connections_per_job=MAX_CONNECTIONS_PER_JOB
+)
+
+# 일시적 오류(네트워크, 429, 5xx)일 때만 다시 시도
+# 비공개/삭제/지역 제한 같은 영구 오류는 바로 실패
+def with_retry(func):
+    for attempt in range(DOWNLOAD_ATTEMPTS):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == DOWNLOAD_ATTEMPTS - 1 or not is_transient_error(e):
+                raise
+            print(f"다운로드 재시도 ({attempt + 1}/{DOWNLOAD_ATTEMPTS}): {e}")
+            time.sleep(2 ** attempt)
+
+# 포맷 하나를 받아 경로를 반환
+# 단일 HTTP 파일은 병렬 Range 다운로드로, 조각(DASH/HLS) 포맷은 yt-dlp 조각 병렬 다운로드로 받음
+def download_format(task, info, format_spec, output_dir, prefix):
+    fmt = select_format(info, format_spec)
+    if not fmt:
+        raise Exception(f"다운로드할 포맷이 없습니다: {format_spec}")
+    
+    title = yt_dlp.utils.sanitize_filename(info.get('title', 'unknown'))
+    path = os.path.join(output_dir, f"{prefix}_{title}.{fmt['ext']}")
+    
+    if not fmt.get('requested_formats') and fmt.get('protocol') in ('http', 'https') and fmt.get('url'):
+        return download_ranges(
+            fmt['url'], path, task.task_id, governor,
+            headers=fmt.get('http_headers'),
+            chunk_size=DOWNLOAD_CHUNK_SIZE,
+            attempts=DOWNLOAD_ATTEMPTS
+        )
+    
+    downloaded = {}
+    
+    def progress_hook(d):
+        if d.get('status') == 'downloading' and d.get('downloaded_bytes') is not None:
+            previous = downloaded.get(d.get('filename'), 0)
+            delta = d['downloaded_bytes'] - previous if d['downloaded_bytes'] >= previous else d['downloaded_bytes']
+            downloaded[d.get('filename')] = d['downloaded_bytes']
+            governor.throttle(task.task_id, delta)
+    
+    # 조각 다운로드는 시작 시점의 작업 몫만큼 연결 슬롯을 빌려서 사용
+    with governor.connection(task.task_id, governor.share(task.task_id)) as connections:
+        opts = {
+            'format': fmt['format_id'],
+            'outtmpl': os.path.join(output_dir, f"{prefix}_%(title)s.%(ext)s"),
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'concurrent_fragment_downloads': connections,
+            'continuedl': True,
+            'retries': 10,
+            'fragment_retries': 10,
+            'progress_hooks': [progress_hook],
+        }
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            result = with_retry(lambda: ydl.process_ie_result(dict(info), download=True))
+            return result['requested_downloads'][0]['filepath']
+
 # 비디오 다운로드 및 음성 추출 함수
 def download_and_extract_audio(task):
+    governor.register(task.task_id)
     try:
         output_dir = os.path.join(temp_dir, task.task_id)
         os.makedirs(output_dir, exist_ok=True)
         
-        # 1단계: MP4 비디오 다운로드
-        video_opts = {
-            'format': 'best[ext=mp4]/best',
-            'outtmpl': os.path.join(output_dir, 'video_%(title)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
-        }
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+            info = with_retry(lambda: ydl.extract_info(task.url, download=False))
         
-        video_path = None
-        with yt_dlp.YoutubeDL(video_opts) as ydl:
-            info = ydl.extract_info(task.url, download=True)
-            title = info.get('title', 'unknown')
-            
-            # MP4 파일 찾기
-            for file in os.listdir(output_dir):
-                if file.startswith('video_') and (file.endswith('.mp4') or file.endswith('.webm')):
-                    video_path = os.path.join(output_dir, file)
-                    break
+        # 1단계: MP4 비디오 다운로드
+        video_path = download_format(task, info, VIDEO_FORMAT, output_dir, 'video')
         
         task.progress = 30
         task.status = "음성 추출 중..."
         
-        # 2단계: 음성 추출 (MP3)
-        audio_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': os.path.join(output_dir, 'audio_%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        audio_path = None
-        with yt_dlp.YoutubeDL(audio_opts) as ydl:
-            ydl.extract_info(task.url, download=True)
-            
-            # MP3 파일 찾기
-            for file in os.listdir(output_dir):
-                if file.startswith('audio_') and file.endswith('.mp3'):
-                    audio_path = os.path.join(output_dir, file)
-                    break
+        # 2단계: 음성 다운로드 후 MP3로 변환
+        source_path = download_format(task, info, AUDIO_FORMAT, output_dir, 'audio')
+        audio_path = os.path.splitext(source_path)[0] + '.mp3'
+        if source_path != audio_path:
+            subprocess.run(
+                ['ffmpeg', '-y', '-loglevel', 'error', '-i', source_path,
+                 '-vn', '-codec:a', 'libmp3lame', '-b:a', '192k', audio_path],
+                check=True
+            )
+            os.remove(source_path)
         
         return {'video': video_path, 'audio': audio_path}
         
     except Exception as e:
         print(f"다운로드 오류: {e}")
         return None
+    
+    finally:
+        governor.unregister(task.task_id)
+
+# 배치 변환기 (모델은 이 스레드에서만 사용)
+# 여러 작업의 음성을 30초 창 단위로 묶어 한 번의 인코더/디코더 패스로 처리
+# 라운드마다 작업별로 창 하나씩만 디코딩하므로, 긴 음성이 변환 중이어도 새 클립이 다음 라운드에 합류함
+class TranscriptionBatcher:
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_items=BATCH_MAX_ITEMS):
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self.jobs = queue.Queue()
+        self.active = []  # 변환 중인 작업 (배치 스레드만 접근)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+    # 음성 배열을 큐에 넣고 배치 결과를 기다림 (구간 리스트 반환)
+    def transcribe(self, audio):
+        return self.wait(self.submit(audio))
+
+    # 여러 조각을 먼저 모두 넣은 뒤 기다리면 같은 배치로 처리됨
+    def submit(self, audio):
+        self.start()
+        job = {'audio': audio, 'done': threading.Event(), 'segments': [], 'error': None,
+               'seek': 0, 'temperature': 0, 'activated_at': None}
+        self.jobs.put(job)
+        return job
+
+    def wait(self, job):
+        job['done'].wait()
+        if job['error']:
+            raise job['error']
+        return job['segments']
+
+    def _run(self):
+        while True:
+            self._admit()
+            self._step()
+
+    def _activate(self, job):
+        if len(job['audio']) == 0:
+            job['done'].set()
+            return
+        job['activated_at'] = time.time()
+        self.active.append(job)
+
+    def _finish(self, job, error=None):
+        if job['done'].is_set():
+            return
+        job['error'] = error
+        # 작업 dict에는 numpy 배열이 있으므로 == 대신 is로 비교
+        self.active = [active for active in self.active if active is not job]
+        job['done'].set()
+
+    # 변환 중인 작업이 없으면 첫 작업을 기다린 뒤 BATCH_WINDOW_MS 동안 더 모음
+    # 변환 중이면 기다리지 않고 그사이 도착한 작업만 합류
+    def _admit(self):
+        if not self.active:
+            self._activate(self.jobs.get())
+            deadline = time.time() + self.window
+            while len(self.active) < self.max_items:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._activate(self.jobs.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        while True:
+            try:
+                self._activate(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+
+    # 한 라운드: 남은 길이가 짧은 작업부터 (오래 기다린 작업은 노화로 앞당김) BATCH_MAX_ITEMS개를 골라
+    # 각 작업의 다음 창을 디코딩. 온도가 다른 창은 따로 묶음
+    def _step(self):
+        now = time.time()
+        batch = sorted(
+            self.active,
+            key=lambda job: ((len(job['audio']) - job['seek']) / whisper.audio.SAMPLE_RATE
+                             - AGING_SECONDS_PER_SECOND * (now - job['activated_at']))
+        )[:self.max_items]
+
+        groups = {}
+        for job in batch:
+            groups.setdefault(job['temperature'], []).append(job)
+        for temperature, group in sorted(groups.items()):
+            try:
+                self._decode_group(group, temperature)
+            except Exception as e:
+                for job in group:
+                    self._finish(job, e)
+
+    def _decode_group(self, group, temperature_index):
+        if not model:
+            raise Exception("Whisper 모델이 로드되지 않았습니다.")
+
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language='ko',
+            task='transcribe'
+        )
+        temperature = TEMPERATURES[temperature_index]
+        options = whisper.DecodingOptions(
+            language='ko',
+            temperature=temperature,
+            best_of=5 if temperature > 0 else None,
+            fp16=model.device.type != 'cpu'
+        )
+
+        # 각 작업의 현재 위치부터 30초 창을 패딩하여 하나의 mel 배치로 디코딩
+        mels = []
+        for job in group:
+            chunk = whisper.pad_or_trim(job['audio'][job['seek']:job['seek'] + whisper.audio.N_SAMPLES])
+            mels.append(whisper.log_mel_spectrogram(chunk, n_mels=model.dims.n_mels))
+        mel_batch = torch.stack(mels).to(model.device)
+        with torch.no_grad():
+            if options.best_of:
+                # whisper의 best_of 샘플링은 배치 크기 1에서만 동작하므로 폴백 창은 하나씩 디코딩
+                results = [whisper.decode(model, mel, options) for mel in mel_batch]
+            else:
+                results = whisper.decode(model, mel_batch, options)
+
+        final = temperature_index == len(TEMPERATURES) - 1
+        for job, result in zip(group, results):
+            next_seek = self._collect_segments(job, job['seek'], result, tokenizer, final)
+            if next_seek is None:
+                # 품질 기준 미달: 이 창만 다음 라운드에서 더 높은 온도로 다시 디코딩
+                job['temperature'] += 1
+                continue
+            job['temperature'] = 0
+            job['seek'] = next_seek
+            if next_seek >= len(job['audio']):
+                self._finish(job)
+
+    # 디코딩 결과를 타임스탬프 구간으로 나누고 다음 시작 샘플을 반환
+    # 품질 기준에 못 미치면 None (마지막 온도에서는 model.transcribe처럼 그대로 받아들임)
+    # model.transcribe의 구간 분리/건너뛰기 규칙을 따름
+    def _collect_segments(self, job, seek, result, tokenizer, final=False):
+        audio_length = len(job['audio'])
+        segment_size = min(whisper.audio.N_SAMPLES, audio_length - seek)
+        offset = seek / whisper.audio.SAMPLE_RATE
+        timestamp_begin = tokenizer.timestamp_begin
+
+        # 무음 창은 건너뜀
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob <= LOGPROB_THRESHOLD:
+            return seek + segment_size
+        if not final and (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                          or result.avg_logprob < LOGPROB_THRESHOLD):
+            return None
+
+        def add_segment(tokens, start_pos, end_pos):
+            text = tokenizer.decode([t for t in tokens if t < tokenizer.eot])
+            if text.strip():
+                job['segments'].append({
+                    'start': offset + start_pos / whisper.audio.TOKENS_PER_SECOND,
+                    'end': min(offset + end_pos / whisper.audio.TOKENS_PER_SECOND,
+                               audio_length / whisper.audio.SAMPLE_RATE),
+                    'text': text
+                })
+
+        tokens = result.tokens
+        is_timestamp = [t >= timestamp_begin for t in tokens]
+        single_timestamp_ending = is_timestamp[-2:] == [False, True]
+        slices = [i for i in range(1, len(tokens)) if is_timestamp[i - 1] and is_timestamp[i]]
+
+        if not slices:
+            # 연속 타임스탬프가 없으면 창 전체가 하나의 구간
+            timestamps = [t - timestamp_begin for t in tokens if t >= timestamp_begin]
+            end_pos = timestamps[-1] if timestamps and timestamps[-1] > 0 else segment_size / whisper.audio.N_SAMPLES_PER_TOKEN
+            add_segment(tokens, 0, end_pos)
+            return seek + segment_size
+
+        if single_timestamp_ending:
+            slices.append(len(tokens))
+        last_slice = 0
+        for current_slice in slices:
+            sliced = tokens[last_slice:current_slice]
+            add_segment(sliced, sliced[0] - timestamp_begin, sliced[-1] - timestamp_begin)
+            last_slice = current_slice
+
+        if single_timestamp_ending:
+            return seek + segment_size
+        last_timestamp_pos = tokens[last_slice - 1] - timestamp_begin
+        if last_timestamp_pos <= 0:
+            return seek + segment_size
+        return seek + last_timestamp_pos * whisper.audio.N_SAMPLES_PER_TOKEN
+
+batcher = TranscriptionBatcher()
+
+# 오디오 지문 계산 (프레임마다 32비트 스펙트럼 해시)
+# 300~2000Hz를 33개 로그 대역으로 나누고, 인접 대역 에너지 차이의 시간 변화 부호를 비트로 사용
+def compute_fingerprints(audio):
+    frame = FINGERPRINT_FRAME_SAMPLES
+    hop = FINGERPRINT_HOP_SAMPLES
+    if len(audio) < frame:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+    edges = np.geomspace(300, 2000, 34)
+    bins = np.searchsorted(np.fft.rfftfreq(frame, 1 / whisper.audio.SAMPLE_RATE), edges)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame)[::hop]
+    window = np.hanning(frame).astype(np.float32)
+
+    # 메모리를 아끼기 위해 프레임을 나눠서 FFT
+    energies = np.empty((len(frames), 33), dtype=np.float64)
+    for start in range(0, len(frames), 1024):
+        power = np.abs(np.fft.rfft(frames[start:start + 1024] * window, axis=1)) ** 2
+        cumulative = np.concatenate([np.zeros((len(power), 1)), np.cumsum(power, axis=1)], axis=1)
+        energies[start:start + len(power)] = cumulative[:, bins[1:]] - cumulative[:, bins[:-1]]
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = np.zeros_like(band_diff, dtype=bool)
+    bits[1:] = (band_diff[1:] - band_diff[:-1]) > 0
+    hashes = bits.astype(np.int64) @ (np.int64(1) << np.arange(32, dtype=np.int64))
+
+    # 무음 프레임과 의미 없는 해시는 제외
+    total = energies.sum(axis=1)
+    valid = (total > 0.01 * np.median(total)) & (hashes != 0) & (hashes != 0xFFFFFFFF)
+    valid[0] = False
+    return hashes, valid
+
+# 오디오 지문 색인 (SQLite, 해시 컬럼 인덱스로 조회)
+# 해시별 저장 횟수를 따로 두어 너무 흔한 해시는 SQL에서 바로 제외 (색인이 커져도 조회량이 일정)
+# 스레드마다 연결을 따로 열어 WAL 모드에서 조회가 서로 막히지 않게 함
+class FingerprintIndex:
+    def __init__(self, path=FINGERPRINT_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.write_lock:
+            conn = self.conn
+            conn.execute('PRAGMA journal_mode=WAL')
+            # 프레임 단위가 다른 이전 색인은 재사용할 수 없으므로 비움
+            if conn.execute('PRAGMA user_version').fetchone()[0] != FINGERPRINT_SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS fingerprints')
+                conn.execute('DROP TABLE IF EXISTS sources')
+                conn.execute('DROP TABLE IF EXISTS hash_counts')
+                conn.execute(f'PRAGMA user_version = {FINGERPRINT_SCHEMA_VERSION}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sources ('
+                'id INTEGER PRIMARY KEY, name TEXT, duration REAL, segments TEXT)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS fingerprints ('
+                'hash INTEGER, source_id INTEGER, frame INTEGER)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints (hash)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS hash_counts ('
+                'hash INTEGER PRIMARY KEY, count INTEGER NOT NULL)'
+            )
+            conn.commit()
+
+    # 현재 스레드의 연결
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self.local.conn = conn
+        return conn
+
+    def add(self, name, hashes, valid, segments, duration):
+        frames = np.nonzero(valid)[0]
+        frames = frames[frames % FINGERPRINT_STORE_EVERY == 0]
+        with self.write_lock:
+            conn = self.conn
+            cursor = conn.execute(
+                'INSERT INTO sources (name, duration, segments) VALUES (?, ?, ?)',
+                (name, duration, json.dumps(segments, ensure_ascii=False))
+            )
+            source_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT INTO fingerprints (hash, source_id, frame) VALUES (?, ?, ?)',
+                ((int(hashes[i]), source_id, int(i)) for i in frames)
+            )
+            conn.executemany(
+                'INSERT INTO hash_counts (hash, count) VALUES (?, 1) '
+                'ON CONFLICT(hash) DO UPDATE SET count = count + 1',
+                ((int(hashes[i]),) for i in frames)
+            )
+            conn.commit()
+
+    # 해시가 같은 저장 프레임 조회: (조회 프레임, 원본 ID, 원본 프레임) 목록
+    # 저장 횟수가 FINGERPRINT_MAX_POSTINGS를 넘는 해시는 행을 읽지 않음
+    def lookup(self, hashes, valid):
+        query_frames = {}
+        for i in np.nonzero(valid)[0]:
+            query_frames.setdefault(int(hashes[i]), []).append(int(i))
+
+        matches = []
+        keys = list(query_frames)
+        conn = self.conn
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f'SELECT hash, source_id, frame FROM fingerprints WHERE hash IN ('
+                f'SELECT hash FROM hash_counts WHERE hash IN ({",".join("?" * len(chunk))}) AND count <= ?)',
+                chunk + [FINGERPRINT_MAX_POSTINGS]
+            ).fetchall()
+            for value, source_id, frame in rows:
+                for query_frame in query_frames[value]:
+                    matches.append((query_frame, source_id, frame))
+        return matches
+
+    def segments(self, source_id):
+        row = self.conn.execute('SELECT segments FROM sources WHERE id = ?', (source_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+fingerprint_index = None
+fingerprint_index_lock = threading.Lock()
+
+def get_fingerprint_index():
+    global fingerprint_index
+    with fingerprint_index_lock:
+        if fingerprint_index is None:
+            fingerprint_index = FingerprintIndex()
+        return fingerprint_index
+
+# 구간별로 가장 많이 투표된 (원본 ID, 프레임 오프셋)을 찾음 (±1 프레임 허용)
+def match_windows(matches, frame_count):
+    frames_per_window = int(FINGERPRINT_WINDOW_SECONDS * whisper.audio.SAMPLE_RATE / FINGERPRINT_HOP_SAMPLES)
+    window_count = -(-frame_count // frames_per_window)
+    votes = [Counter() for _ in range(window_count)]
+    for query_frame, source_id, frame in matches:
+        votes[query_frame // frames_per_window][(source_id, frame - query_frame)] += 1
+
+    windows = []
+    for counter in votes:
+        best = None
+        best_votes = 0
+        for (source_id, offset) in counter:
+            total = sum(counter.get((source_id, offset + d), 0) for d in (-1, 0, 1))
+            if total > best_votes:
+                best, best_votes = (source_id, offset), total
+        windows.append(best if best_votes >= FINGERPRINT_MIN_VOTES else None)
+    return windows, frames_per_window
+
+# 음성 배열을 변환하여 구간 리스트 반환 (길이와 관계없이 배치 변환기에서 창 단위로 처리)
+def transcribe_audio(audio):
+    return batcher.transcribe(audio)
+
+# 음성의 여러 조각을 변환하여 전체 시간 기준 구간 리스트 반환
+# 조각을 한꺼번에 배치 변환기에 넣어 같은 배치로 처리
+def transcribe_pieces(audio, pieces):
+    sample_rate = whisper.audio.SAMPLE_RATE
+    jobs = [(start, batcher.submit(audio[start:end])) for start, end in pieces]
+
+    segments = []
+    for start, job in jobs:
+        for seg in batcher.wait(job):
+            segments.append({
+                'start': seg['start'] + start / sample_rate,
+                'end': seg['end'] + start / sample_rate,
+                'text': seg['text']
+            })
+    return segments
+
+# 일치 구간에는 원본 자막을 옮겨 쓰고, 나머지(미일치 구간, 재사용 자막이 덮지 못한 경계)만 변환
+def reuse_matched_segments(audio, windows, window_samples, sources):
+    sample_rate = whisper.audio.SAMPLE_RATE
+    tolerance = DEDUP_BOUNDARY_TOLERANCE_SECONDS
+
+    # 같은 원본/오프셋이 이어지는 구간끼리 묶음
+    spans = []
+    for i, match in enumerate(windows):
+        start, end = i * window_samples, min((i + 1) * window_samples, len(audio))
+        if spans and spans[-1]['match'] == match:
+            spans[-1]['end'] = end
+        else:
+            spans.append({'start': start, 'end': end, 'match': match})
+    spans[-1]['end'] = len(audio)
+
+    segments = []
+    gaps = []
+    for span in spans:
+        if not span['match']:
+            gaps.append((span['start'], span['end']))
+            continue
+
+        source_id, offset_frames = span['match']
+        offset = offset_frames * FINGERPRINT_HOP_SAMPLES / sample_rate
+        span_start = span['start'] / sample_rate
+        span_end = span['end'] / sample_rate
+
+        # 구간 안에 완전히 들어오는 자막만 재사용 (경계에 걸친 자막은 잘라 쓰지 않고 다시 변환)
+        reused = [
+            {'start': max(seg['start'] - offset, span_start),
+             'end': min(seg['end'] - offset, span_end),
+             'text': seg['text']}
+            for seg in sources[source_id]
+            if seg['start'] - offset >= span_start - tolerance and seg['end'] - offset <= span_end + tolerance
+        ]
+        if not reused:
+            gaps.append((span['start'], span['end']))
+            continue
+
+        segments.extend(reused)
+        covered_start = min(seg['start'] for seg in reused)
+        covered_end = max(seg['end'] for seg in reused)
+        if covered_start - span_start >= DEDUP_MIN_GAP_SECONDS:
+            gaps.append((span['start'], int(covered_start * sample_rate)))
+        if span_end - covered_end >= DEDUP_MIN_GAP_SECONDS:
+            gaps.append((int(covered_end * sample_rate), span['end']))
+
+    # 맞닿은 미일치 부분은 하나로 합쳐서 변환
+    merged = []
+    for start, end in sorted(gaps):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    segments.extend(transcribe_pieces(audio, merged))
+    segments.sort(key=lambda seg: seg['start'])
+    return segments
+
+# 지문이 일치하는 구간은 기존 자막을 재사용하고 나머지만 변환
+# 색인을 열거나 조회하지 못하면 일반 변환으로 진행 (지문 단계 때문에 작업이 실패하지 않도록)
+def transcribe_with_dedup(name, audio):
+    sample_rate = whisper.audio.SAMPLE_RATE
+    try:
+        index = get_fingerprint_index()
+        hashes, valid = compute_fingerprints(audio)
+        windows, frames_per_window = match_windows(index.lookup(hashes, valid), len(hashes))
+        sources = {match[0]: index.segments(match[0]) for match in windows if match}
+    except Exception as e:
+        print(f"지문 색인 오류, 일반 변환으로 진행: {e}")
+        return transcribe_audio(audio)
+
+    matched = sum(1 for w in windows if w)
+    window_samples = frames_per_window * FINGERPRINT_HOP_SAMPLES
+    if not windows or matched / len(windows) < DEDUP_MIN_MATCH_RATIO:
+        segments = transcribe_audio(audio)
+    else:
+        segments = reuse_matched_segments(audio, windows, window_samples, sources)
+
+    # 일치하지 않은 구간의 프레임과 자막만 색인에 추가 (이미 색인된 음성은 다시 저장하지 않음)
+    if matched < len(windows):
+        unmatched = np.repeat([w is None for w in windows], frames_per_window)[:len(hashes)]
+        new_segments = [
+            seg for seg in segments
+            if windows[min(int((seg['start'] + seg['end']) / 2 * sample_rate) // window_samples,
+                           len(windows) - 1)] is None
+        ]
+        try:
+            index.add(name, hashes, valid & unmatched, new_segments, len(audio) / sample_rate)
+        except Exception as e:
+            print(f"지문 색인 저장 오류: {e}")
+    return segments
 
 # 텍스트 변환 함수
 def convert_audio_to_text(task, audio_path):
@@ -287,9 +991,11 @@ def convert_audio_to_text(task, audio_path):
         if not model:
             raise Exception("Whisper 모델이 로드되지 않았습니다.")
         
-        # Whisper로 음성 인식
-        result = model.transcribe(audio_path, language='ko')
-        text = result['text']
+        audio = whisper.load_audio(audio_path)
+        
+        # 재업로드/미러 영상은 지문 색인으로 기존 자막 재사용
+        segments = transcribe_with_dedup(task.url, audio)
+        text = ' '.join(segment['text'].strip() for segment in segments)
         
         # 텍스트 파일 저장
         output_dir = os.path.dirname(audio_path)
@@ -377,6 +1083,12 @@ if __name__ == '__main__':
     cleanup_thread.daemon = True
     cleanup_thread.start()
     
+    # 짧은 클립 배치 변환 스레드 시작
+    batcher.start()
+    
+    # 작업 스케줄러 스레드 시작
+    scheduler.start()
+    
     print("유튜브 텍스트 변환기 서버 시작")
     print("브라우저에서 http://localhost:5000 접속")
     
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+downloader.py 확인용 테스트 (표준 라이브러리만 사용)
+지연 시간을 넣은 로컬 HTTP 서버로 병렬 Range 다운로드, 연결 상한, 속도 조절, 이어받기를 확인
+
+실행: python -m unittest test_downloader
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader import DownloadGovernor, download_ranges, is_transient_error
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+# Range를 지원하는 테스트 서버 (요청마다 지연, 동시 연결 수 기록, 중간 끊김 주입)
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, drop_first=0):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.latency = latency
+        self.drop_first = drop_first  # 처음 N개의 Range 응답은 절반만 보내고 끊음
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path='/media.mp4'):
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.requests += 1
+        try:
+            time.sleep(server.latency)
+            if self.path == '/missing':
+                self.send_error(404)
+                return
+
+            start, end = 0, len(PAYLOAD) - 1
+            ranged = 'Range' in self.headers
+            if ranged:
+                start, end = self.headers['Range'].split('=')[1].split('-')
+                start, end = int(start), min(int(end), len(PAYLOAD) - 1)
+            body = PAYLOAD[start:end + 1]
+
+            self.send_response(206 if ranged else 200)
+            self.send_header('Content-Length', str(len(body)))
+            if ranged:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+            self.end_headers()
+
+            with server.lock:
+                drop = ranged and len(body) > 1 and server.drop_first > 0
+                if drop:
+                    server.drop_first -= 1
+            if drop:
+                body = body[:len(body) // 2]
+            for offset in range(0, len(body), 64 * 1024):
+                self.wfile.write(body[offset:offset + 64 * 1024])
+                with server.lock:
+                    server.bytes_sent += len(body[offset:offset + 64 * 1024])
+            if drop:
+                self.close_connection = True
+        finally:
+            with server.lock:
+                server.active -= 1
+
+class DownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def download(self, server, governor, job_id, name, **kwargs):
+        governor.register(job_id)
+        try:
+            path = download_ranges(server.url(kwargs.pop('path', '/media.mp4')),
+                                   os.path.join(self.dir, name), job_id, governor,
+                                   chunk_size=256 * 1024, retry_delay=0.01, **kwargs)
+        finally:
+            governor.unregister(job_id)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_parallel_ranges_within_job_share(self):
+        server = FixtureServer()
+        try:
+            governor = DownloadGovernor(max_connections=8, max_connections_per_job=4)
+            self.assertEqual(self.download(server, governor, 'a', 'a.mp4'), PAYLOAD)
+            self.assertGreater(server.peak, 1)
+            self.assertLessEqual(server.peak, 4)
+        finally:
+            server.stop()
+
+    def test_global_connection_cap_across_jobs(self):
+        server = FixtureServer()
+        try:
+            governor = DownloadGovernor(max_connections=4, max_connections_per_job=4)
+            results = {}
+            threads = [threading.Thread(target=lambda j=j: results.update({j: self.download(server, governor, j, j)}))
+                       for j in ('a', 'b', 'c')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, {'a': PAYLOAD, 'b': PAYLOAD, 'c': PAYLOAD})
+            self.assertLessEqual(server.peak, 4)
+        finally:
+            server.stop()
+
+    def test_fair_share_rebalances(self):
+        governor = DownloadGovernor(max_connections=6, max_connections_per_job=6)
+        governor.register('a')
+        self.assertEqual(governor.share('a'), 6)
+        governor.register('b')
+        self.assertEqual((governor.share('a'), governor.share('b')), (3, 3))
+        governor.register('c')
+        governor.register('d')
+        self.assertEqual([governor.share(j) for j in 'abcd'], [2, 2, 1, 1])
+        governor.unregister('a')
+        self.assertEqual([governor.share(j) for j in 'bcd'], [2, 2, 2])
+
+    def test_token_bucket_paces_job(self):
+        server = FixtureServer(latency=0)
+        try:
+            governor = DownloadGovernor(max_bytes_per_second=2 * 1024 * 1024)
+            started = time.time()
+            self.assertEqual(self.download(server, governor, 'a', 'a.mp4'), PAYLOAD)
+            # 3MB를 2MB/s로 받으므로 최소 1.5초
+            self.assertGreaterEqual(time.time() - started, 1.4)
+        finally:
+            server.stop()
+
+    def test_bandwidth_shared_fairly_between_jobs(self):
+        server = FixtureServer(latency=0)
+        try:
+            governor = DownloadGovernor(max_bytes_per_second=4 * 1024 * 1024)
+            finished = {}
+            started = time.time()
+
+            def run(job_id):
+                self.download(server, governor, job_id, job_id)
+                finished[job_id] = time.time() - started
+
+            threads = [threading.Thread(target=run, args=(j,)) for j in ('a', 'b')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # 두 작업이 4MB/s를 나눠 쓰므로 각각 약 2MB/s → 둘 다 1.5초 전후에 끝남
+            self.assertGreaterEqual(min(finished.values()), 1.2)
+            self.assertLess(abs(finished['a'] - finished['b']), 0.6)
+        finally:
+            server.stop()
+
+    def test_resumes_after_dropped_connections(self):
+        server = FixtureServer(drop_first=3)
+        try:
+            governor = DownloadGovernor(max_connections_per_job=2)
+            self.assertEqual(self.download(server, governor, 'a', 'a.mp4'), PAYLOAD)
+            self.assertEqual(server.drop_first, 0)
+            # 끊긴 청크는 받은 위치부터 이어받으므로 처음부터 다시 받은 만큼 늘지 않음
+            self.assertLess(server.bytes_sent, len(PAYLOAD) + 256 * 1024)
+        finally:
+            server.stop()
+
+    def test_resumes_from_partial_file(self):
+        server = FixtureServer(drop_first=100)
+        try:
+            governor = DownloadGovernor(max_connections_per_job=2)
+            with self.assertRaises(Exception):
+                self.download(server, governor, 'a', 'a.mp4', attempts=1)
+            self.assertTrue(os.path.exists(os.path.join(self.dir, 'a.mp4.part.json')))
+
+            server.drop_first = 0
+            sent_before = server.bytes_sent
+            self.assertEqual(self.download(server, governor, 'a', 'a.mp4'), PAYLOAD)
+            self.assertLess(server.bytes_sent - sent_before, len(PAYLOAD))
+        finally:
+            server.stop()
+
+    def test_permanent_error_is_not_retried(self):
+        server = FixtureServer()
+        try:
+            governor = DownloadGovernor()
+            with self.assertRaises(urllib.error.HTTPError):
+                self.download(server, governor, 'a', 'a.mp4', path='/missing')
+            self.assertEqual(server.requests, 1)
+        finally:
+            server.stop()
+
+    def test_transient_error_classification(self):
+        def http_error(code):
+            return urllib.error.HTTPError('http://x', code, 'error', {}, None)
+
+        self.assertTrue(is_transient_error(http_error(503)))
+        self.assertTrue(is_transient_error(http_error(429)))
+        self.assertFalse(is_transient_error(http_error(404)))
+        self.assertFalse(is_transient_error(http_error(403)))
+        self.assertTrue(is_transient_error(ConnectionResetError()))
+        self.assertFalse(is_transient_error(ValueError('private video')))
+
+        # yt-dlp DownloadError처럼 exc_info로 원인을 감싼 경우
+        wrapped = Exception('download failed')
+        wrapped.exc_info = (None, ConnectionResetError(), None)
+        self.assertTrue(is_transient_error(wrapped))
+
+if __name__ == '__main__':
+    unittest.main()
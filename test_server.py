@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+server.py 확인용 테스트 (모델 가중치 없이 실행)
+
+실행: python -m unittest test_server
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import torch
+import whisper
+
+import server
+
+SAMPLE_RATE = 16000
+
+# 음정이 바뀌는 배음 신호 (음성과 비슷한 스펙트럼 구조를 가진 합성 음성)
+def harmonic_signal(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    n = seconds * SAMPLE_RATE
+    f0 = np.repeat(rng.uniform(90, 250, seconds * 5), SAMPLE_RATE // 5)[:n]
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    x = sum(np.sin(k * phase) / k * rng.uniform(0.3, 1) for k in range(1, 15))
+    envelope = np.repeat(rng.uniform(0.05, 1, seconds * 4), SAMPLE_RATE // 4)[:n]
+    return (x * envelope * 0.05 + rng.standard_normal(n) * 0.002).astype(np.float32)
+
+class FingerprintTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.audio = harmonic_signal(60)
+        cls.hashes, cls.valid = server.compute_fingerprints(cls.audio)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.index = server.FingerprintIndex(os.path.join(self.dir, 'data', 'fp.db'))
+        self.index.add('original', self.hashes, self.valid, [], 60)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def matched_windows(self, audio):
+        hashes, valid = server.compute_fingerprints(audio)
+        windows, _ = server.match_windows(self.index.lookup(hashes, valid), len(hashes))
+        return windows
+
+    def test_matches_copies_shifted_off_the_hop_grid(self):
+        rng = np.random.default_rng(1)
+        for shift in (200, 400, 19680, 12345):
+            copy = np.concatenate([np.zeros(shift, np.float32), self.audio])
+            copy += rng.standard_normal(len(copy)).astype(np.float32) * 0.002
+            windows = self.matched_windows(copy)
+            full_windows = windows[:len(self.audio) // (server.FINGERPRINT_WINDOW_SECONDS * SAMPLE_RATE)]
+            with self.subTest(shift=shift):
+                self.assertTrue(all(full_windows), windows)
+                source_id, offset = full_windows[0]
+                # 투표는 ±1 프레임을 묶으므로 오프셋 오차는 2프레임 이내
+                self.assertLessEqual(abs(offset * server.FINGERPRINT_HOP_SAMPLES + shift),
+                                     2 * server.FINGERPRINT_HOP_SAMPLES)
+
+    def test_unrelated_audio_does_not_match(self):
+        self.assertFalse(any(self.matched_windows(harmonic_signal(30, seed=5))))
+
+    def test_dedup_reuses_segments_and_indexes_only_new_audio(self):
+        calls = []
+
+        def fake_transcribe(audio):
+            calls.append(len(audio) / SAMPLE_RATE)
+            duration = len(audio) / SAMPLE_RATE
+            return [{'start': t, 'end': min(t + 3, duration), 'text': 'new'}
+                    for t in np.arange(0, duration, 3.0)]
+
+        class FakeBatcher:
+            def submit(self, audio):
+                return audio
+
+            def wait(self, job):
+                return fake_transcribe(job)
+
+        original = {name: getattr(server, name) for name in ('transcribe_audio', 'batcher', 'fingerprint_index')}
+        try:
+            server.transcribe_audio = fake_transcribe
+            server.batcher = FakeBatcher()
+            server.fingerprint_index = server.FingerprintIndex(os.path.join(self.dir, 'dedup.db'))
+
+            server.transcribe_with_dedup('original', self.audio)
+            rows_before = self.count_rows(server.fingerprint_index)
+            calls.clear()
+
+            # 앞부분을 임의 샘플만큼 자르고 새 음성을 덧붙인 미러
+            mirror = np.concatenate([self.audio[12345:], harmonic_signal(20, seed=7)])
+            segments = server.transcribe_with_dedup('mirror', mirror)
+            self.assertLess(sum(calls), 35)
+            self.assertGreater(sum(1 for seg in segments if seg['text'] == 'new'), 0)
+            self.assertLess(self.count_rows(server.fingerprint_index) - rows_before, rows_before / 2)
+        finally:
+            for name, value in original.items():
+                setattr(server, name, value)
+
+    def test_index_failure_falls_back_to_plain_transcription(self):
+        original = {name: getattr(server, name) for name in ('transcribe_audio', 'get_fingerprint_index')}
+        try:
+            server.transcribe_audio = lambda audio: [{'start': 0, 'end': 1, 'text': 'plain'}]
+
+            def broken_index():
+                raise OSError('read-only file system')
+
+            server.get_fingerprint_index = broken_index
+            self.assertEqual(server.transcribe_with_dedup('x', self.audio)[0]['text'], 'plain')
+        finally:
+            for name, value in original.items():
+                setattr(server, name, value)
+
+    def test_common_hashes_are_excluded_in_sql(self):
+        index = server.FingerprintIndex(os.path.join(self.dir, 'common.db'))
+        valid = np.ones(server.FINGERPRINT_STORE_EVERY, dtype=bool)
+        every_stored_frame = np.full(server.FINGERPRINT_STORE_EVERY, 7, dtype=np.int64)
+        for copy in range(server.FINGERPRINT_MAX_POSTINGS + 1):
+            index.add(f'copy{copy}', every_stored_frame, valid, [], 1)
+        index.add('rare', np.array([9], dtype=np.int64), np.array([True]), [], 1)
+
+        matches = index.lookup(np.array([7, 9], dtype=np.int64), np.array([True, True]))
+        self.assertEqual([(query_frame, frame) for query_frame, _, frame in matches], [(1, 0)])
+
+    def test_concurrent_lookups_use_separate_connections(self):
+        results = []
+        connections = []
+
+        def lookup():
+            connections.append(self.index.conn)
+            results.append(len(self.index.lookup(self.hashes, self.valid)))
+
+        threads = [threading.Thread(target=lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(conn) for conn in connections}), 4)
+        self.assertEqual(len(set(results)), 1)
+        self.assertGreater(results[0], 0)
+
+    @staticmethod
+    def count_rows(index):
+        return index.conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+# 가짜 모델로 배치 변환기의 창 단위 진행 확인
+# decode는 남은 음성이 20초보다 길면 20초 위치에서 창을 끊어 다시 넣기를 유도
+class BatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = whisper.tokenizer.get_tokenizer(True, num_languages=99, language='ko', task='transcribe')
+        self.text = self.tokenizer.encode(' 안녕하세요')
+        self.calls = []  # decode마다 (작업 길이(초), 온도) 목록
+        self.failing = set()  # 첫 창의 첫 시도에서 품질 기준에 못 미치는 작업 길이(초)
+        self.fake_model = SimpleNamespace(dims=SimpleNamespace(n_mels=80), device=torch.device('cpu'),
+                                          is_multilingual=True, num_languages=99)
+        patches = [mock.patch.object(server, 'model', self.fake_model),
+                   mock.patch.object(whisper, 'decode', self.fake_decode)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def result(self, tokens, no_speech_prob=0.0, avg_logprob=-0.2, compression_ratio=1.2):
+        return SimpleNamespace(tokens=tokens, no_speech_prob=no_speech_prob,
+                               avg_logprob=avg_logprob, compression_ratio=compression_ratio)
+
+    def ts(self, seconds):
+        return self.tokenizer.timestamp_begin + int(seconds * whisper.audio.TOKENS_PER_SECOND)
+
+    def fake_decode(self, model, mel, options):
+        # mel만으로는 작업을 알 수 없으므로 _decode_group에 넘어온 작업 목록을 사용
+        # 2차원 mel은 폴백 창을 하나씩 디코딩하는 경우 (whisper.decode처럼 결과 하나를 반환)
+        single = mel.ndim == 2
+        jobs = [self.current.pop(0)] if single else self.current
+        self.calls.append([(len(job['audio']) // SAMPLE_RATE, options.temperature) for job in jobs])
+        results = []
+        for job in jobs:
+            seconds = len(job['audio']) // SAMPLE_RATE
+            remaining = seconds - job['seek'] // SAMPLE_RATE
+            if seconds in self.failing and job['seek'] == 0 and options.temperature == 0:
+                results.append(self.result([self.ts(0)] + self.text, compression_ratio=3.0))
+            elif remaining > 20:
+                # 0~10초, 10~20초 구간을 닫고 20초에서 끝나는 창 → 20초 위치부터 다시 디코딩
+                results.append(self.result([self.ts(0)] + self.text + [self.ts(10), self.ts(10)]
+                                           + self.text + [self.ts(20), self.ts(20)]))
+            else:
+                # 남은 음성이 한 구간으로 끝나는 창
+                results.append(self.result([self.ts(0)] + self.text + [self.ts(remaining)]))
+        time.sleep(0.01)
+        return results[0] if single else results
+
+    def make_batcher(self):
+        batcher = server.TranscriptionBatcher(window_ms=50, max_items=4)
+        decode_group = batcher._decode_group
+
+        def recording_decode_group(group, temperature_index):
+            self.current = list(group)
+            return decode_group(group, temperature_index)
+
+        batcher._decode_group = recording_decode_group
+        return batcher
+
+    def collect(self, tokens, seconds=60, seek=0, final=False, **quality):
+        batcher = server.TranscriptionBatcher()
+        job = {'audio': np.zeros(seconds * SAMPLE_RATE, np.float32), 'segments': []}
+        next_seek = batcher._collect_segments(job, seek, self.result(tokens, **quality), self.tokenizer, final)
+        return next_seek, job['segments']
+
+    def test_collect_requeues_at_last_timestamp(self):
+        next_seek, segments = self.collect([self.ts(0)] + self.text + [self.ts(7.5), self.ts(7.5)]
+                                           + self.text + [self.ts(12), self.ts(12)])
+        self.assertEqual(next_seek, 12 * SAMPLE_RATE)
+        self.assertEqual([(seg['start'], seg['end']) for seg in segments], [(0, 7.5), (7.5, 12)])
+
+    def test_collect_single_timestamp_ending_consumes_window(self):
+        next_seek, segments = self.collect([self.ts(0)] + self.text + [self.ts(4), self.ts(4)]
+                                           + self.text + [self.ts(9)], seek=SAMPLE_RATE)
+        self.assertEqual(next_seek, SAMPLE_RATE + whisper.audio.N_SAMPLES)
+        self.assertEqual([(seg['start'], seg['end']) for seg in segments], [(1, 5), (5, 10)])
+
+    def test_collect_skips_silence_and_rejects_low_quality(self):
+        self.assertEqual(self.collect(self.text, no_speech_prob=0.9, avg_logprob=-1.5),
+                         (whisper.audio.N_SAMPLES, []))
+        self.assertEqual(self.collect([self.ts(0)] + self.text, compression_ratio=3.0), (None, []))
+        # 마지막 온도에서는 품질 기준 미달이어도 받아들이고 창 끝까지 진행
+        next_seek, segments = self.collect([self.ts(0)] + self.text, compression_ratio=3.0, final=True)
+        self.assertEqual(next_seek, whisper.audio.N_SAMPLES)
+        self.assertEqual(len(segments), 1)
+
+    def test_long_audio_advances_window_by_window(self):
+        segments = self.make_batcher().transcribe(np.zeros(45 * SAMPLE_RATE, np.float32))
+        self.assertEqual([seg['start'] for seg in segments], [0, 10, 20, 30, 40])
+        self.assertEqual(segments[-1]['end'], 45)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_short_clip_is_interleaved_with_long_audio(self):
+        batcher = self.make_batcher()
+        finished = {}
+
+        def run(seconds):
+            batcher.transcribe(np.zeros(seconds * SAMPLE_RATE, np.float32))
+            finished[seconds] = len(self.calls)
+
+        long_job = threading.Thread(target=run, args=(600,))
+        long_job.start()
+        while len(self.calls) < 3:
+            time.sleep(0.005)
+        run(15)
+        long_job.join()
+        # 짧은 클립은 긴 음성이 끝나기를 기다리지 않고 다음 라운드에 합류해 끝남
+        self.assertLess(finished[15], 6)
+        self.assertEqual(finished[600], 30)
+        self.assertTrue(any(len(call) == 2 for call in self.calls))
+
+    def test_fallback_retries_only_the_failing_window(self):
+        self.failing.add(25)
+        batcher = self.make_batcher()
+        jobs = [batcher.submit(np.zeros(seconds * SAMPLE_RATE, np.float32)) for seconds in (15, 25)]
+        results = [batcher.wait(job) for job in jobs]
+        self.assertEqual(self.calls, [[(15, 0.0), (25, 0.0)], [(25, 0.2)], [(25, 0.0)]])
+        self.assertEqual([seg['start'] for seg in results[1]], [0, 10, 20])
+
+    def test_decode_error_fails_only_its_group(self):
+        batcher = self.make_batcher()
+        with mock.patch.object(whisper, 'decode', side_effect=RuntimeError('out of memory')):
+            with self.assertRaises(RuntimeError):
+                batcher.transcribe(np.zeros(5 * SAMPLE_RATE, np.float32))
+        self.assertEqual(len(batcher.transcribe(np.zeros(5 * SAMPLE_RATE, np.float32))), 1)
+
+# yt-dlp 포맷 선택 확인 (네트워크 없이 extract_info 결과와 같은 형태의 info 사용)
+class FormatTest(unittest.TestCase):
+    def setUp(self):
+        raw = {
+            'id': 'x', 'title': 'clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': 'http://example.com/x', 'duration': 100,
+            'formats': [
+                {'format_id': 'video', 'url': 'http://example.com/v.mp4', 'ext': 'mp4',
+                 'vcodec': 'avc1', 'acodec': 'none', 'filesize': 1000},
+                {'format_id': 'audio', 'url': 'http://example.com/a.m4a', 'ext': 'm4a',
+                 'vcodec': 'none', 'acodec': 'mp4a', 'filesize_approx': 200},
+                {'format_id': 'muxed', 'url': 'http://example.com/p.mp4', 'ext': 'mp4',
+                 'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 300},
+            ]
+        }
+        # probe_video는 extract_info가 한 번 처리한 info를 다시 선택에 넘김
+        self.info = server.select_format(raw, 'bestvideo*+bestaudio/best')
+
+    def test_progressive_format(self):
+        fmt = server.select_format(self.info, server.VIDEO_FORMAT)
+        self.assertEqual((fmt['format_id'], fmt['url'], fmt['protocol']), ('muxed', 'http://example.com/p.mp4', 'http'))
+        self.assertFalse(fmt.get('requested_formats'))
+        # 크기가 없으면 비트레이트 x 길이로 추정
+        self.assertEqual(server.selected_filesize(self.info, server.VIDEO_FORMAT), 300 * 1000 // 8 * 100)
+
+    def test_merged_format_sums_parts(self):
+        fmt = server.select_format(self.info, 'bestvideo+bestaudio')
+        self.assertEqual([f['format_id'] for f in fmt['requested_formats']], ['video', 'audio'])
+        self.assertEqual(server.selected_filesize(self.info, 'bestvideo+bestaudio'), 1200)
+
+    def test_unavailable_format(self):
+        self.assertIsNone(server.select_format(self.info, 'best[height>4000]'))
+        self.assertIsNone(server.selected_filesize(self.info, 'best[height>4000]'))
+
+# 예상 비용 기반 스케줄러 확인 (process_video는 가짜로 대체)
+class SchedulerTest(unittest.TestCase):
+    def task(self, name, cost, long=False, waited=0):
+        task = server.ConversionTask(name, 'http://example.com/' + name)
+        task.estimate = {'cost': cost, 'long': long}
+        task.queued_at = time.time() - waited
+        return task
+
+    def scheduler(self, *tasks, **kwargs):
+        scheduler = server.JobScheduler(**kwargs)
+        scheduler.pending.extend(tasks)
+        return scheduler
+
+    def test_cheapest_job_first(self):
+        scheduler = self.scheduler(self.task('slow', 600), self.task('fast', 30), self.task('mid', 120))
+        self.assertEqual(scheduler._next_task().task_id, 'fast')
+        self.assertEqual([scheduler.position(t) for t in scheduler.pending], [3, 1, 2])
+
+    def test_aging_promotes_long_waiting_job(self):
+        # 비용 차이 570초 / 노화 2배 = 285초 넘게 기다린 작업이 앞섬
+        scheduler = self.scheduler(self.task('slow', 600, waited=300), self.task('fast', 30))
+        self.assertEqual(scheduler._next_task().task_id, 'slow')
+
+    def test_long_job_cap(self):
+        scheduler = self.scheduler(self.task('long', 3600, long=True), self.task('short', 4000),
+                                   max_long_jobs=1)
+        self.assertEqual(scheduler._next_task().task_id, 'long')
+        scheduler.running_long = 1
+        self.assertEqual(scheduler._next_task().task_id, 'short')
+        scheduler.pending.pop()
+        self.assertIsNone(scheduler._next_task())
+
+    def test_long_job_dispatched_despite_stream_of_short_jobs(self):
+        started = []
+
+        def fake_process(task):
+            started.append(task.task_id)
+            time.sleep(0.02)
+
+        scheduler = server.JobScheduler(max_jobs=1)
+        with mock.patch.object(server, 'process_video', fake_process), \
+                mock.patch.object(server, 'AGING_SECONDS_PER_SECOND', 10000):
+            scheduler.submit(self.task('long', 1000, long=True))
+            # 짧은 작업이 처리 속도보다 빠르게 계속 들어와 대기열이 비지 않음
+            for index in range(200):
+                scheduler.submit(self.task(f'short{index}', 1))
+                time.sleep(0.01)
+                if 'long' in started:
+                    break
+            self.assertIn('long', started)
+            self.assertGreater(len(scheduler.pending), 0)
+            # 먼저 들어온 짧은 작업들이 앞서 처리되지만, 가장 오래 기다린 짧은 작업보다
+            # 0.1초(비용 차이 / 노화) 넘게 더 기다린 긴 작업이 차례를 받음
+            self.assertGreater(started.index('long'), 0)
+            with scheduler.condition:
+                scheduler.pending.clear()
+
+if __name__ == '__main__':
+    unittest.main()